@@ -9,17 +9,127 @@ import threading
 import time
 from datetime import datetime
 
-class EmotionDetector:
+
+class AdaptiveFrameEncoder:
+    """JPEG encoder that sizes and tunes frames for each polling client"""
+
+    MIN_QUALITY = 40
+    MAX_QUALITY = 90
+    DEFAULT_QUALITY = 75
+    QUALITY_STEP = 5
+    MAX_DIMENSION = 1920
+    ENCODE_BUDGET = 0.25  # Fraction of the client's fetch interval encoding may use
+    SMOOTHING = 0.2  # Weight of the newest sample in the moving averages
+    CLIENT_TIMEOUT = 30.0  # Seconds before an idle client's state is dropped
+    MAX_CLIENT_ID_LENGTH = 64
+
     def __init__(self):
+        self.clients = {}
+        self.lock = threading.Lock()
+
+    def parse_target_size(self, width, height):
+        """Parse the client's declared target size, ignoring invalid values"""
+        try:
+            width = int(width) if width else 0
+            height = int(height) if height else 0
+        except ValueError:
+            return 0, 0
+        width = max(0, min(width, self.MAX_DIMENSION))
+        height = max(0, min(height, self.MAX_DIMENSION))
+        return width, height
+
+    def resize(self, frame, width, height):
+        """Shrink frame to fit within the target size, keeping aspect ratio"""
+        frame_height, frame_width = frame.shape[:2]
+        scales = []
+        if width:
+            scales.append(width / frame_width)
+        if height:
+            scales.append(height / frame_height)
+        if not scales or min(scales) >= 1.0:
+            return frame  # Never upscale
+        scale = min(scales)
+        size = (max(1, int(frame_width * scale)), max(1, int(frame_height * scale)))
+        return cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+
+    def parse_client_id(self, client_id, fallback):
+        """Use the client's declared id, falling back when missing or too long"""
+        if not client_id or len(client_id) > self.MAX_CLIENT_ID_LENGTH:
+            return fallback
+        return client_id
+
+    def register_fetch(self, client_id):
+        """Record a fetch and return the client's state"""
+        now = time.time()
+        with self.lock:
+            # Drop clients that stopped polling
+            for key in [k for k, v in self.clients.items() if now - v['last_fetch'] > self.CLIENT_TIMEOUT]:
+                del self.clients[key]
+
+            state = self.clients.get(client_id)
+            if state is None:
+                state = {
+                    'quality': self.DEFAULT_QUALITY,
+                    'encode_time': None,
+                    'fetch_interval': None,
+                    'last_fetch': now
+                }
+                self.clients[client_id] = state
+            else:
+                interval = now - state['last_fetch']
+                state['fetch_interval'] = self.smooth(state['fetch_interval'], interval)
+                state['last_fetch'] = now
+            return state
+
+    def smooth(self, average, sample):
+        if average is None:
+            return sample
+        return (1 - self.SMOOTHING) * average + self.SMOOTHING * sample
+
+    def encode(self, state, frame, width, height):
+        """Resize and JPEG-encode frame, adapting quality to the client"""
+        with self.lock:
+            quality = state['quality']
+
+        start = time.perf_counter()
+        resized = self.resize(frame, width, height)
+        ok, buffer = cv2.imencode('.jpg', resized, [int(cv2.IMWRITE_JPEG_QUALITY), quality])
+        encode_time = time.perf_counter() - start
+        if not ok:
+            raise Exception("Failed to encode frame")
+
+        with self.lock:
+            state['encode_time'] = self.smooth(state['encode_time'], encode_time)
+            if state['fetch_interval']:
+                budget = state['fetch_interval'] * self.ENCODE_BUDGET
+                if state['encode_time'] > budget:
+                    # Encoding can't keep up with the client, trade quality for speed
+                    state['quality'] = max(self.MIN_QUALITY, quality - self.QUALITY_STEP)
+                elif state['encode_time'] < budget / 2:
+                    state['quality'] = min(self.MAX_QUALITY, quality + self.QUALITY_STEP)
+
+        return buffer, quality
+
+
+class EmotionDetector:
+    def __init__(self, camera_source=None):
         self.app = Flask(__name__)
-        CORS(self.app)  # Enable CORS for web interface
+        CORS(self.app, expose_headers=['ETag'])  # Enable CORS for web interface
         self.cap = None
+        # Factory returning a cv2.VideoCapture-like object (isOpened/read/release)
+        self.camera_source = camera_source or (lambda: cv2.VideoCapture(0))
         self.is_detecting = False
         self.current_emotion = None
         self.emotion_confidence = 0.0
         self.detection_thread = None
         self.debug_mode = True  # Enable debug mode
         
+        # Latest annotated frame published by the detection loop
+        self.latest_frame = None
+        self.frame_seq = 0
+        self.frame_lock = threading.Lock()
+        self.frame_encoder = AdaptiveFrameEncoder()
+        
         # Supported emotions
         self.emotions = ['happy', 'sad', 'angry', 'fear', 'neutral']
         
@@ -81,28 +191,53 @@ class EmotionDetector:
         
         @self.app.route('/get_video_frame', methods=['GET'])
         def get_video_frame():
-            """Get current video frame with face border overlay"""
+            """Get current video frame with face border overlay
+            
+            Optional query parameters ``width`` and ``height`` declare the
+            size the client renders the frame at; the frame is downscaled to
+            fit. Responses carry an ETag keyed on the frame sequence number,
+            so a request with a matching If-None-Match gets a 304 and no
+            encoding work is done.
+            """
             try:
-                if self.cap and self.cap.isOpened():
-                    ret, frame = self.cap.read()
-                    if ret:
-                        # Analyze emotion and get frame with border
-                        result = self.analyze_emotion(frame)
-                        
-                        # Convert frame to base64 for transmission
-                        _, buffer = cv2.imencode('.jpg', result['frame_with_border'])
-                        frame_base64 = base64.b64encode(buffer).decode('utf-8')
-                        
-                        return jsonify({
-                            'status': 'success',
-                            'frame': f"data:image/jpeg;base64,{frame_base64}",
-                            'emotion': result['emotion'],
-                            'confidence': result['confidence']
-                        })
-                    else:
-                        return jsonify({'status': 'error', 'message': 'Failed to capture frame'})
-                else:
+                if not (self.cap and self.cap.isOpened()):
                     return jsonify({'status': 'error', 'message': 'Camera not available'})
+                
+                with self.frame_lock:
+                    frame = self.latest_frame
+                    seq = self.frame_seq
+                
+                if frame is None:
+                    return jsonify({'status': 'error', 'message': 'No frame available yet'})
+                
+                width, height = self.frame_encoder.parse_target_size(
+                    request.args.get('width'), request.args.get('height'))
+                etag = f'{seq}-{width}x{height}'
+                client_id = self.frame_encoder.parse_client_id(
+                    request.args.get('client'), request.remote_addr)
+                client_state = self.frame_encoder.register_fetch(client_id)
+                
+                # If-None-Match uses weak comparison and also matches "*"
+                if request.if_none_match.contains_weak(etag):
+                    response = self.app.response_class(status=304)
+                    response.set_etag(etag)
+                    return response
+                
+                # Convert frame to base64 for transmission
+                buffer, quality = self.frame_encoder.encode(client_state, frame, width, height)
+                frame_base64 = base64.b64encode(buffer).decode('utf-8')
+                
+                response = jsonify({
+                    'status': 'success',
+                    'frame': f"data:image/jpeg;base64,{frame_base64}",
+                    'emotion': self.current_emotion or 'no_face',
+                    'confidence': self.emotion_confidence,
+                    'sequence': seq,
+                    'quality': quality
+                })
+                response.set_etag(etag)
+                response.headers['Cache-Control'] = 'no-cache'
+                return response
                     
             except Exception as e:
                 return jsonify({'status': 'error', 'message': str(e)})
@@ -110,7 +245,7 @@ class EmotionDetector:
     def start_camera(self):
         """Start camera capture"""
         if self.cap is None:
-            self.cap = cv2.VideoCapture(0)
+            self.cap = self.camera_source()
             if not self.cap.isOpened():
                 raise Exception("Could not open camera")
             
@@ -122,7 +257,9 @@ class EmotionDetector:
     
     def stop_camera(self):
         """Stop camera capture"""
-        self.is_detecting = False
+        with self.frame_lock:
+            self.is_detecting = False
+            self.latest_frame = None
         if self.cap:
             self.cap.release()
             self.cap = None
@@ -143,6 +280,14 @@ class EmotionDetector:
                     
                     try:
                         result = self.analyze_emotion(frame)
+                        
+                        # Publish annotated frame for /get_video_frame, unless
+                        # detection was stopped while this frame was analyzed
+                        with self.frame_lock:
+                            if self.is_detecting:
+                                self.latest_frame = result['frame_with_border']
+                                self.frame_seq += 1
+                        
                         if result['status'] == 'success':
                             self.current_emotion = result['emotion']
                             self.emotion_confidence = result['confidence']
@@ -274,6 +419,7 @@ class EmotionDetector:
         print("  POST /stop_detection - Stop camera and detection") 
         print("  GET  /get_emotion - Get current emotion and confidence")
         print("  POST /analyze_frame - Analyze emotion from base64 frame")
+        print("  GET  /get_video_frame - Get annotated frame (?width=&height=, ETag/304)")
         self.app.run(host=host, port=port, debug=False)
 
 if __name__ == "__main__":
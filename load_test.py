@@ -0,0 +1,402 @@
+#!/usr/bin/env python3
+"""
+Load testing tool for the Python emotion detection backend
+
+Simulates many concurrent browser clients following the script.js traffic
+pattern: /get_emotion polled every 100 ms, /get_video_frame polled every
+50 ms, plus periodic /analyze_frame uploads taken from a recorded frame set.
+By default a camera-less stub server is started locally, replaying the same
+frames in place of the webcam.
+
+Requires aiohttp, which is listed in requirements.txt
+
+Usage:
+    python3 load_test.py --clients 200 --duration 30
+    python3 load_test.py --frames recorded_frames/ --clients 100
+    python3 load_test.py --url http://localhost:5000   # use a running server
+    python3 load_test.py --serve --port 5001           # only run the stub server
+"""
+
+import argparse
+import asyncio
+import base64
+import math
+import os
+import subprocess
+import sys
+import time
+
+import cv2
+import numpy as np
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+
+class RecordedFrameSource:
+    """Camera stand-in that replays recorded frames at a fixed frame rate"""
+
+    def __init__(self, frames, fps=30):
+        self.frames = frames
+        self.interval = 1.0 / fps
+        self.index = 0
+        self.last_read = 0.0
+        self.opened = True
+
+    def isOpened(self):
+        return self.opened
+
+    def read(self):
+        if not self.opened:
+            return False, None
+
+        # Block until the next frame is due, like a real camera
+        wait = self.last_read + self.interval - time.time()
+        if wait > 0:
+            time.sleep(wait)
+        self.last_read = time.time()
+
+        frame = self.frames[self.index % len(self.frames)].copy()
+        self.index += 1
+        return True, frame
+
+    def release(self):
+        self.opened = False
+
+
+def load_frames(frames_dir=None, count=30):
+    """Load recorded frames from a directory, or generate synthetic ones"""
+    if frames_dir:
+        frames = []
+        for name in sorted(os.listdir(frames_dir)):
+            if name.lower().endswith(('.jpg', '.jpeg', '.png')):
+                frame = cv2.imread(os.path.join(frames_dir, name))
+                if frame is not None:
+                    frames.append(frame)
+        if not frames:
+            raise Exception(f"No images found in {frames_dir}")
+        return frames
+
+    # Synthetic 640x480 frames with a moving face-like shape
+    frames = []
+    for i in range(count):
+        frame = np.full((480, 640, 3), 40, dtype=np.uint8)
+        center = (320 + int(40 * np.sin(i / count * 2 * np.pi)), 240)
+        cv2.ellipse(frame, center, (90, 120), 0, 0, 360, (150, 180, 220), -1)
+        cv2.circle(frame, (center[0] - 35, center[1] - 30), 10, (30, 30, 30), -1)
+        cv2.circle(frame, (center[0] + 35, center[1] - 30), 10, (30, 30, 30), -1)
+        cv2.ellipse(frame, (center[0], center[1] + 45), (40, 15), 0, 0, 180, (60, 60, 160), 4)
+        frames.append(frame)
+    return frames
+
+
+def encode_uploads(frames):
+    """Encode frames as the data URLs script.js would upload"""
+    uploads = []
+    for frame in frames:
+        _, buffer = cv2.imencode('.jpg', frame)
+        uploads.append(f"data:image/jpeg;base64,{base64.b64encode(buffer).decode('utf-8')}")
+    return uploads
+
+
+def serve(frames_dir, host, port):
+    """Run the emotion detection server with the recorded frame source"""
+    from emotion_detector import EmotionDetector
+
+    frames = load_frames(frames_dir)
+    detector = EmotionDetector(camera_source=lambda: RecordedFrameSource(frames))
+    detector.debug_mode = False
+    detector.run(host=host, port=port)
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of values"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, math.ceil(pct / 100.0 * len(ordered)) - 1))
+    return ordered[index]
+
+
+class EndpointStats:
+    """Request counters and latencies for a single endpoint"""
+
+    def __init__(self, name):
+        self.name = name
+        self.latencies = []
+        self.not_modified = 0
+        self.http_errors = 0
+        self.app_errors = 0
+        self.failures = 0  # Connection errors and timeouts
+        self.bytes_received = 0
+
+    @property
+    def requests(self):
+        return len(self.latencies) + self.failures
+
+    @property
+    def error_rate(self):
+        if not self.requests:
+            return 0.0
+        return (self.http_errors + self.app_errors + self.failures) / self.requests
+
+
+class ServerMonitor:
+    """Samples CPU and thread usage of a local server process from /proc"""
+
+    def __init__(self, pid):
+        self.pid = pid
+        self.clock_ticks = os.sysconf('SC_CLK_TCK')
+        self.cpu_samples = []
+        self.thread_samples = []
+        self.last_cpu = None
+
+    def read_stat(self):
+        with open(f'/proc/{self.pid}/stat') as f:
+            # Fields after the command name, which may itself contain spaces
+            fields = f.read().rsplit(')', 1)[1].split()
+        cpu_time = (int(fields[11]) + int(fields[12])) / self.clock_ticks
+        threads = int(fields[17])
+        return cpu_time, threads
+
+    def sample(self):
+        try:
+            cpu_time, threads = self.read_stat()
+        except (OSError, IndexError, ValueError):
+            return
+        now = time.time()
+        if self.last_cpu is not None:
+            last_time, last_cpu_time = self.last_cpu
+            self.cpu_samples.append(100.0 * (cpu_time - last_cpu_time) / (now - last_time))
+        self.last_cpu = (now, cpu_time)
+        self.thread_samples.append(threads)
+
+
+class LoadTest:
+    def __init__(self, url, clients, duration, ramp_up, upload_interval, uploads, monitor=None,
+                 stop_detection=False):
+        self.url = url.rstrip('/')
+        self.clients = clients
+        self.duration = duration
+        self.ramp_up = ramp_up
+        self.upload_interval = upload_interval
+        self.uploads = uploads
+        self.monitor = monitor
+        self.stop_detection = stop_detection  # Stop the shared camera session when done
+        self.stats = {name: EndpointStats(name) for name in
+                      ('/get_emotion', '/get_video_frame', '/analyze_frame')}
+        self.sequences = []  # (time, frame sequence) seen by video clients
+        self.deadline = 0.0
+
+    async def request(self, session, method, endpoint, **kwargs):
+        """Send one request and record it, returning (status, json body, ETag)"""
+        stats = self.stats[endpoint]
+        start = time.perf_counter()
+        try:
+            async with session.request(method, self.url + endpoint, **kwargs) as response:
+                body = await response.read()
+                stats.latencies.append(time.perf_counter() - start)
+                stats.bytes_received += len(body)
+
+                if response.status == 304:
+                    stats.not_modified += 1
+                    return response.status, None, response.headers.get('ETag')
+                if response.status != 200:
+                    stats.http_errors += 1
+                    return response.status, None, None
+
+                try:
+                    data = await response.json(content_type=None)
+                except ValueError:  # Includes JSONDecodeError and UnicodeDecodeError
+                    data = None
+                if not isinstance(data, dict) or data.get('status') == 'error':
+                    stats.app_errors += 1
+                    return response.status, None, None
+                return response.status, data, response.headers.get('ETag')
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            stats.failures += 1
+            return None, None, None
+
+    async def poll_emotion(self, session):
+        while time.time() < self.deadline:
+            await self.request(session, 'GET', '/get_emotion')
+            await asyncio.sleep(0.1)
+
+    async def poll_video(self, session, client_id):
+        etag = None
+        while time.time() < self.deadline:
+            headers = {'If-None-Match': etag} if etag else {}
+            status, data, new_etag = await self.request(
+                session, 'GET', '/get_video_frame', headers=headers,
+                params={'width': 480, 'height': 360, 'client': client_id})
+            if status in (200, 304):
+                etag = new_etag
+            if data and 'sequence' in data:
+                self.sequences.append((time.time(), data['sequence']))
+            await asyncio.sleep(0.05)
+
+    async def upload_frames(self, session, offset):
+        index = offset
+        while time.time() < self.deadline:
+            frame = self.uploads[index % len(self.uploads)]
+            await self.request(session, 'POST', '/analyze_frame', json={'frame': frame})
+            index += 1
+            await asyncio.sleep(self.upload_interval)
+
+    async def client(self, session, number):
+        # Stagger client start-up across the ramp-up period
+        await asyncio.sleep(self.ramp_up * number / self.clients)
+        tasks = [self.poll_emotion(session), self.poll_video(session, f'load-{number}')]
+        if self.upload_interval > 0 and self.uploads:
+            tasks.append(self.upload_frames(session, number))
+        await asyncio.gather(*tasks)
+
+    async def sample_server(self):
+        while time.time() < self.deadline:
+            self.monitor.sample()
+            await asyncio.sleep(1.0)
+
+    async def run(self):
+        timeout = aiohttp.ClientTimeout(total=10)
+        connector = aiohttp.TCPConnector(limit=self.clients * 3)
+        async with aiohttp.ClientSession(timeout=timeout, connector=connector) as session:
+            # Detection is shared by all clients, so start it once up front
+            async with session.post(self.url + '/start_detection') as response:
+                data = await response.json(content_type=None)
+                if data.get('status') != 'success':
+                    raise Exception(f"Failed to start detection: {data.get('message')}")
+
+            self.deadline = time.time() + self.duration
+            tasks = [self.client(session, i) for i in range(self.clients)]
+            if self.monitor:
+                tasks.append(self.sample_server())
+            await asyncio.gather(*tasks)
+
+            # Only stop detection we own; a running server may be in live use
+            if self.stop_detection:
+                async with session.post(self.url + '/stop_detection') as response:
+                    await response.read()
+
+    def report(self):
+        # Requests are only issued before the deadline, so throughput is measured
+        # over the configured duration rather than including the in-flight tail
+        elapsed = self.duration
+        print("\n📊 Load test results")
+        print("=" * 78)
+        print(f"Clients: {self.clients}   Duration: {elapsed:.1f}s   Target: {self.url}")
+        print()
+        print(f"{'Endpoint':<18}{'Requests':>9}{'Req/s':>9}{'p50 ms':>9}{'p90 ms':>9}"
+              f"{'p99 ms':>9}{'Max ms':>9}{'Errors':>9}")
+        total_requests = 0
+        for stats in self.stats.values():
+            total_requests += stats.requests
+            latencies = [latency * 1000 for latency in stats.latencies]
+            print(f"{stats.name:<18}{stats.requests:>9}{stats.requests / elapsed:>9.1f}"
+                  f"{percentile(latencies, 50):>9.1f}{percentile(latencies, 90):>9.1f}"
+                  f"{percentile(latencies, 99):>9.1f}{max(latencies, default=0):>9.1f}"
+                  f"{stats.error_rate:>8.1%}")
+        print(f"{'Total':<18}{total_requests:>9}{total_requests / elapsed:>9.1f}")
+
+        print("\nErrors (HTTP / application / connection+timeout):")
+        for stats in self.stats.values():
+            print(f"  {stats.name:<18}{stats.http_errors} / {stats.app_errors} / {stats.failures}")
+
+        video = self.stats['/get_video_frame']
+        if video.requests:
+            print(f"\n/get_video_frame: {video.not_modified / video.requests:.1%} answered 304, "
+                  f"{video.bytes_received / elapsed / 1024:.1f} KiB/s received")
+
+        print("\nServer saturation:")
+        if len(self.sequences) > 1:
+            first_time, first_seq = min(self.sequences)
+            last_time, last_seq = max(self.sequences)
+            if last_time > first_time:
+                print(f"  Detection loop rate: {(last_seq - first_seq) / (last_time - first_time):.1f} frames/s")
+        if self.monitor and self.monitor.cpu_samples:
+            cpu = self.monitor.cpu_samples
+            print(f"  Server CPU: avg {sum(cpu) / len(cpu):.0f}%, max {max(cpu):.0f}% "
+                  f"({os.cpu_count()} cores available)")
+            print(f"  Server threads: max {max(self.monitor.thread_samples)}")
+        elif not self.monitor:
+            print("  CPU/thread sampling only available for the local stub server")
+
+
+def wait_for_server(url, process, timeout=180):
+    """Wait until the spawned server answers, allowing for model loading"""
+    import urllib.request
+
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise Exception("Stub server exited during start-up")
+        try:
+            urllib.request.urlopen(url + '/get_emotion', timeout=1)
+            return
+        except OSError:
+            time.sleep(1)
+    raise Exception("Timed out waiting for stub server")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the emotion detection backend")
+    parser.add_argument('--url', help="Test a running server instead of starting a stub server")
+    parser.add_argument('--clients', type=int, default=100, help="Number of simulated browser clients")
+    parser.add_argument('--duration', type=float, default=30, help="Test duration in seconds")
+    parser.add_argument('--ramp-up', type=float, default=5, help="Seconds over which clients start")
+    parser.add_argument('--upload-interval', type=float, default=1.0,
+                        help="Seconds between /analyze_frame uploads per client (0 disables)")
+    parser.add_argument('--frames', help="Directory of recorded frames (synthetic frames if omitted)")
+    parser.add_argument('--host', default='localhost', help="Stub server host")
+    parser.add_argument('--port', type=int, default=5001, help="Stub server port")
+    parser.add_argument('--serve', action='store_true', help="Only run the stub server")
+    parser.add_argument('--stop-detection', action='store_true',
+                        help="Stop detection on the --url server when done (always done for the stub)")
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.frames, args.host, args.port)
+        return
+
+    if aiohttp is None:
+        print("❌ aiohttp is required for load testing. Install it with: pip3 install -r requirements.txt")
+        sys.exit(1)
+
+    uploads = encode_uploads(load_frames(args.frames))
+    process = None
+    monitor = None
+    url = args.url
+
+    if not url:
+        url = f"http://{args.host}:{args.port}"
+        command = [sys.executable, os.path.abspath(__file__), '--serve',
+                   '--host', args.host, '--port', str(args.port)]
+        if args.frames:
+            command += ['--frames', args.frames]
+        print(f"🚀 Starting stub server on {url}...")
+        process = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                                   cwd=os.path.dirname(os.path.abspath(__file__)))
+        if os.path.exists(f'/proc/{process.pid}/stat'):
+            monitor = ServerMonitor(process.pid)
+
+    try:
+        if process:
+            wait_for_server(url, process)
+        print(f"🔄 Simulating {args.clients} clients for {args.duration:.0f}s...")
+        test = LoadTest(url, args.clients, args.duration, args.ramp_up,
+                        args.upload_interval, uploads, monitor,
+                        stop_detection=process is not None or args.stop_detection)
+        asyncio.run(test.run())
+        test.report()
+    except Exception as e:
+        print(f"❌ Load test failed: {e}")
+        sys.exit(1)
+    finally:
+        if process:
+            process.terminate()
+            process.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -12,6 +12,11 @@ class EmotionVerifier {
         this.emotionConfidence = 0;
         this.pythonBackend = 'http://localhost:5000';
         this.usePythonBackend = true; // Set to false to use TensorFlow.js
+        this.lastFrameEtag = null; // ETag of the last processed frame received
+        // Per-tab id so the backend tunes frame quality for each viewer separately
+        this.clientId = window.crypto && crypto.randomUUID
+            ? crypto.randomUUID()
+            : Math.random().toString(36).slice(2);
         
         this.emotions = ['happy', 'sad', 'angry', 'fear', 'neutral'];
         this.emotionMap = {
@@ -197,8 +202,17 @@ class EmotionVerifier {
         if (!this.isDetecting) return;
 
         try {
-            const response = await fetch(`${this.pythonBackend}/get_video_frame`);
+            // Ask for frames at the preview size, skipping frames we already have
+            const width = this.processedVideo.width;
+            const height = this.processedVideo.height;
+            const headers = this.lastFrameEtag ? { 'If-None-Match': this.lastFrameEtag } : {};
+            const response = await fetch(
+                `${this.pythonBackend}/get_video_frame?width=${width}&height=${height}&client=${this.clientId}`,
+                { headers, cache: 'no-store' }
+            );
+            // 304 Not Modified means the current frame is still up to date
             if (response.ok) {
+                this.lastFrameEtag = response.headers.get('ETag');
                 const data = await response.json();
                 if (data.status === 'success') {
                     // Update processed video with face border
@@ -223,6 +237,7 @@ class EmotionVerifier {
         
         this.video.srcObject = null;
         this.isDetecting = false;
+        this.lastFrameEtag = null;
         
         // Stop Python backend if using it
         if (this.usePythonBackend) {